@@ -1,5 +1,8 @@
 #include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
 #include <algorithm>
+#include <vector>
 #include <getopt.h>
 
 #include "CycleTimer.h"
@@ -47,6 +50,7 @@ void usage(const char* progname) {
     printf("Program Options:\n");
     printf("  -t  --threads <N>  Use N threads\n");
     printf("  -v  --view <INT>   Use specified view settings (1-6)\n");
+    printf("  -s  --sweep-threads <N1,N2,...>  Run the threaded version once per thread count\n");
     printf("  -?  --help         This message\n");
 }
 
@@ -67,6 +71,24 @@ bool verifyResult (int *gold, int *result, int width, int height) {
     return 1;
 }
 
+// Parse a comma separated list of thread counts ("1,2,4,8").  Returns
+// false if any entry is not a positive integer.
+bool parseThreadList(const char* arg, std::vector<int>& threadCounts) {
+
+    threadCounts.clear();
+    const char* p = arg;
+    while (*p) {
+        char* end;
+        long value = strtol(p, &end, 10);
+        if (end == p || value <= 0 || (*end != ',' && *end != '\0'))
+            return false;
+        threadCounts.push_back((int)value);
+        p = (*end == ',') ? end + 1 : end;
+    }
+
+    return !threadCounts.empty();
+}
+
 #define VIEWCNT 6
 
 int main(int argc, char** argv) {
@@ -75,6 +97,7 @@ int main(int argc, char** argv) {
     const int height = 900;
     const int maxIterations = 256;
     int numThreads = 2;
+    std::vector<int> sweepThreads;
 #ifdef ENABLE_THREAD_TIMING
     int activeView = 1;
 #endif
@@ -94,11 +117,12 @@ int main(int argc, char** argv) {
     static struct option long_options[] = {
         {"threads", 1, 0, 't'},
         {"view", 1, 0, 'v'},
+        {"sweep-threads", 1, 0, 's'},
         {"help", 0, 0, '?'},
         {0 ,0, 0, 0}
     };
 
-    while ((opt = getopt_long(argc, argv, "t:v:?", long_options, NULL)) != EOF) {
+    while ((opt = getopt_long(argc, argv, "t:v:s:?", long_options, NULL)) != EOF) {
 
         switch (opt) {
         case 't':
@@ -124,6 +148,14 @@ int main(int argc, char** argv) {
             }
             break;
         }
+        case 's':
+        {
+            if (!parseThreadList(optarg, sweepThreads)) {
+                fprintf(stderr, "Invalid thread list\n");
+                return 1;
+            }
+            break;
+        }
         case '?':
         default:
             usage(argv[0]);
@@ -149,40 +181,50 @@ int main(int argc, char** argv) {
         minSerial = std::min(minSerial, endTime - startTime);
     }
 
-    printf("[mandelbrot serial]:\t\t[%.3f] ms\n", minSerial * 1000);
     writePPMImage(output_serial, width, height, "mandelbrot-serial.ppm", maxIterations);
 
     //
-    // Run the threaded version
+    // Run the threaded version once per requested thread count.  The
+    // serial baseline above is shared by every entry of a sweep, so each
+    // count prints its own serial/thread/speedup block.
     //
-    memset(output_thread, 0, width * height * sizeof(int));
-    double minThread = 1e30;
-    for (int i = 0; i < 5; ++i) {
-        double startTime = CycleTimer::currentSeconds();
+    if (sweepThreads.empty())
+        sweepThreads.push_back(numThreads);
+
+    for (size_t t = 0; t < sweepThreads.size(); ++t) {
+        numThreads = sweepThreads[t];
+
+        memset(output_thread, 0, width * height * sizeof(int));
+        double minThread = 1e30;
+        for (int i = 0; i < 5; ++i) {
+            double startTime = CycleTimer::currentSeconds();
 #ifdef ENABLE_THREAD_TIMING
-        char label[128];
-        snprintf(label, sizeof(label), "view_%d_iter_%d_threads_%d", activeView, i + 1, numThreads);
-        ThreadTiming::setRunLabel(label);
+            char label[128];
+            snprintf(label, sizeof(label), "view_%d_iter_%d_threads_%d", activeView, i + 1, numThreads);
+            ThreadTiming::setRunLabel(label);
 #endif
-        mandelbrotThread(numThreads, x0, y0, x1, y1, width, height, maxIterations, output_thread);
-        double endTime = CycleTimer::currentSeconds();
-        minThread = std::min(minThread, endTime - startTime);
-    }
+            mandelbrotThread(numThreads, x0, y0, x1, y1, width, height, maxIterations, output_thread);
+            double endTime = CycleTimer::currentSeconds();
+            minThread = std::min(minThread, endTime - startTime);
+        }
 
-    printf("[mandelbrot thread]:\t\t[%.3f] ms\n", minThread * 1000);
-    writePPMImage(output_thread, width, height, "mandelbrot-thread.ppm", maxIterations);
+        printf("[mandelbrot serial]:\t\t[%.3f] ms\n", minSerial * 1000);
+        printf("[mandelbrot thread]:\t\t[%.3f] ms\n", minThread * 1000);
+        writePPMImage(output_thread, width, height, "mandelbrot-thread.ppm", maxIterations);
 
-    if (! verifyResult (output_serial, output_thread, width, height)) {
-        printf ("ERROR : Output from threads does not match serial output\n");
+        if (! verifyResult (output_serial, output_thread, width, height)) {
+            printf ("ERROR : Output from threads does not match serial output\n");
 
-        delete[] output_serial;
-        delete[] output_thread;
+            delete[] output_serial;
+            delete[] output_thread;
 
-        return 1;
-    }
+            return 1;
+        }
 
-    // compute speedup
-    printf("++++\t\t\t\t(%.2fx speedup from %d threads)\n", minSerial/minThread, numThreads);
+        // compute speedup
+        printf("++++\t\t\t\t(%.2fx speedup from %d threads)\n", minSerial/minThread, numThreads);
+        fflush(stdout);
+    }
 
     delete[] output_serial;
     delete[] output_thread;
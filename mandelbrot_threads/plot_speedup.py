@@ -4,11 +4,18 @@ from __future__ import annotations
 
 import argparse
 import csv
+import functools
+import os
 import re
+import shutil
 import subprocess
 import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import List, Tuple
+from typing import Iterator, List, Tuple
+
+import numpy as np
 
 SCRIPT_DIR = Path(__file__).resolve().parent
 
@@ -16,34 +23,179 @@ SPEEDUP_RE = re.compile(r"\((?P<speedup>[-+]?[0-9]*\.?[0-9]+)x speedup from (?P<
 SERIAL_RE = re.compile(r"\[mandelbrot serial\]:\s*\[(?P<ms>[0-9.]+)\] ms")
 THREAD_RE = re.compile(r"\[mandelbrot thread\]:\s*\[(?P<ms>[0-9.]+)\] ms")
 
+ROW_FMT = "threads={:2d} serial={:8.3f}ms threaded={:8.3f}ms speedup={:5.2f}"
 
-def run_case(exe: Path, threads: int, view: int, extra_args: List[str]) -> Tuple[float, float, float]:
-    cmd = [str(exe), "--threads", str(threads), "--view", str(view), *extra_args]
-    try:
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            check=True,
-        )
-    except subprocess.CalledProcessError as exc:
-        sys.stderr.write(exc.stdout)
-        sys.stderr.write(exc.stderr)
-        raise
-
-    output = result.stdout + result.stderr
-
-    serial_match = SERIAL_RE.search(output)
-    thread_match = THREAD_RE.search(output)
-    speedup_match = SPEEDUP_RE.search(output)
-
-    if not (serial_match and thread_match and speedup_match):
+# Every column is numeric, so rows are formatted directly instead of going
+# through the csv module's quoting logic.
+CSV_HEADER = b"threads,serial_ms,thread_ms,speedup\n"
+CSV_ROW_FMT = b"%d,%.6f,%.6f,%.6f\n"
+
+# Files the driver leaves in its working directory.
+PPM_OUTPUTS = ("mandelbrot-serial.ppm", "mandelbrot-thread.ppm")
+TIMING_CSV = "thread_timings.csv"
+
+
+# Cached so repeated try_plot calls apply the stylesheet only once.
+@functools.lru_cache(maxsize=None)
+def _apply_plot_style() -> None:
+    import matplotlib.pyplot as plt
+
+    plt.style.use("seaborn-v0_8-whitegrid")
+
+
+def run_sweep(
+    exe: Path,
+    threads_list: List[int],
+    view: int,
+    extra_args: List[str],
+    cpus: List[int] | None = None,
+    cwd: Path | None = None,
+) -> Iterator[Tuple[int, float, float, float]]:
+    sweep = ",".join(str(t) for t in threads_list)
+    cmd = [str(exe), "--sweep-threads", sweep, "--view", str(view), *extra_args]
+    if cpus is not None:
+        cmd = ["taskset", "-c", ",".join(str(c) for c in cpus), *cmd]
+    # The driver flushes stdout after every block, so rows are yielded while
+    # the sweep is still running.  Output stays as bytes; only lines that
+    # pass the prefix check are decoded before the regex runs.
+    parsed = 0
+    serial_ms = thread_ms = None
+    captured = []
+    with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, cwd=cwd) as proc:
+        for line in proc.stdout:
+            captured.append(line)
+            if line.startswith(b"[mandelbrot "):
+                if b"serial" in line:
+                    match = SERIAL_RE.match(line.decode())
+                    if match:
+                        serial_ms = float(match.group("ms"))
+                elif b"thread" in line:
+                    match = THREAD_RE.match(line.decode())
+                    if match:
+                        thread_ms = float(match.group("ms"))
+            elif b"speedup" in line:
+                match = SPEEDUP_RE.search(line.decode())
+                if match and serial_ms is not None and thread_ms is not None:
+                    yield (
+                        int(match.group("threads")),
+                        serial_ms,
+                        thread_ms,
+                        float(match.group("speedup")),
+                    )
+                    parsed += 1
+                    serial_ms = thread_ms = None
+
+    output = b"".join(captured).decode(errors="replace")
+    if proc.returncode:
+        sys.stderr.write(output)
+        raise subprocess.CalledProcessError(proc.returncode, cmd, output)
+    if parsed != len(threads_list):
         raise RuntimeError("Failed to parse program output.\n" + output)
 
-    serial_ms = float(serial_match.group("ms"))
-    thread_ms = float(thread_match.group("ms"))
-    speedup = float(speedup_match.group("speedup"))
-    return serial_ms, thread_ms, speedup
+
+def available_cpus() -> List[int]:
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def plan_lanes(threads_list: List[int], cpus: List[int]) -> List[Tuple[List[int], List[int]]]:
+    # Give each thread count, largest first, its own disjoint CPU set while
+    # CPUs remain; later counts queue on the least loaded lane wide enough
+    # to hold them.  Returns no lanes if the largest count does not fit.
+    lanes: List[Tuple[List[int], List[int]]] = []
+    free = list(cpus)
+    for t in sorted(threads_list, reverse=True):
+        if t <= len(free):
+            lanes.append((free[:t], [t]))
+            free = free[t:]
+            continue
+        fits = [lane for lane in lanes if len(lane[0]) >= t]
+        if not fits:
+            return []
+        min(fits, key=lambda lane: len(lane[1]))[1].append(t)
+    for _, counts in lanes:
+        counts.sort()
+    return lanes
+
+
+def run_packed(
+    exe: Path,
+    threads_list: List[int],
+    lanes: List[Tuple[List[int], List[int]]],
+    view: int,
+    extra_args: List[str],
+) -> Iterator[Tuple[int, float, float, float]]:
+    # Lanes run concurrently, each pinned to its CPUs and in its own working
+    # directory so their outputs do not collide; those outputs are merged
+    # back into the current directory once every lane has finished.  Rows
+    # are released in threads_list order as soon as every earlier row has
+    # arrived.
+    index = {t: i for i, t in enumerate(threads_list)}
+    pending = {}
+    next_index = 0
+    with tempfile.TemporaryDirectory() as tmp, ThreadPoolExecutor(max_workers=len(lanes)) as pool:
+        futures = []
+        lane_dirs = []
+        for n, (cpus, counts) in enumerate(lanes):
+            lane_dir = Path(tmp) / f"lane{n}"
+            lane_dir.mkdir()
+            lane_dirs.append(lane_dir)
+            futures.append(
+                pool.submit(
+                    lambda c=counts, p=cpus, d=lane_dir: list(run_sweep(exe, c, view, extra_args, p, d))
+                )
+            )
+        try:
+            for future in as_completed(futures):
+                for row in future.result():
+                    pending[index[row[0]]] = row
+                while next_index in pending:
+                    yield pending.pop(next_index)
+                    next_index += 1
+        finally:
+            pool.shutdown(wait=True)
+            merge_lane_outputs(lane_dirs, Path.cwd())
+
+
+def merge_lane_outputs(lane_dirs: List[Path], dest: Path) -> None:
+    # Lane 0 holds the largest thread count and runs it last, so its images
+    # are the ones a sequential sweep would have left behind.
+    for name in PPM_OUTPUTS:
+        src = lane_dirs[0] / name
+        if src.exists():
+            shutil.copyfile(src, dest / name)
+
+    # ENABLE_THREAD_TIMING builds append to thread_timings.csv.  Each lane
+    # numbers its runs from 1, so shift run ids to keep them unique the way
+    # a single sweep process would.
+    lane_timings = [d / TIMING_CSV for d in lane_dirs if (d / TIMING_CSV).exists()]
+    if not lane_timings:
+        return
+    target = dest / TIMING_CSV
+    need_header = not target.exists() or target.stat().st_size == 0
+    offset = 0
+    with target.open("a", newline="") as out:
+        writer = csv.writer(out, lineterminator="\n")
+        for src in lane_timings:
+            with src.open(newline="") as fp:
+                reader = csv.reader(fp)
+                header = next(reader, None)
+                if header is None:
+                    continue
+                if need_header:
+                    writer.writerow(header)
+                    need_header = False
+                col = header.index("run_id")
+                lane_max = 0
+                for row in reader:
+                    if not row:
+                        continue
+                    run_id = int(row[col])
+                    lane_max = max(lane_max, run_id)
+                    row[col] = str(run_id + offset)
+                    writer.writerow(row)
+                offset += lane_max
 
 
 def parse_args() -> argparse.Namespace:
@@ -84,24 +236,42 @@ def parse_args() -> argparse.Namespace:
         default=None,
         help="Optional path to save the plot as PNG",
     )
+    parser.add_argument(
+        "--pack-cpus",
+        action="store_true",
+        help="Run thread counts concurrently on disjoint CPU sets via taskset "
+        "(faster sweeps on many-core hosts; shared caches may perturb timings). "
+        "Images and thread_timings.csv from each group are merged into the current directory",
+    )
     parser.add_argument(
         "extra",
         nargs=argparse.REMAINDER,
         help="Additional arguments to pass to the executable",
     )
     args = parser.parse_args()
-    args.threads = sorted(set(args.threads))
+    if not args.threads:
+        parser.error("--threads needs at least one value")
+    # Thread lists are usually already increasing; only sort when they are not.
+    seen = dict.fromkeys(args.threads)
+    if all(a < b for a, b in zip(args.threads, args.threads[1:])):
+        args.threads = list(seen)
+    else:
+        args.threads = sorted(seen)
+
+    # Paths are only opened or passed to subprocess, so making them absolute
+    # is enough; resolving symlinks would just add filesystem round trips.
+    cwd = Path.cwd()
 
     exe = args.exe or (SCRIPT_DIR / "mandelbrot")
     exe = exe.expanduser()
     if not exe.is_absolute():
-        exe = (Path.cwd() / exe).resolve()
+        exe = cwd / exe
     args.exe = exe
 
     csv_path = args.csv or (SCRIPT_DIR / "speedup_view1.csv")
     csv_path = csv_path.expanduser()
     if not csv_path.is_absolute():
-        csv_path = (Path.cwd() / csv_path).resolve()
+        csv_path = cwd / csv_path
     args.csv = csv_path
 
     return args
@@ -119,19 +289,21 @@ def try_plot(
         print("matplotlib not available; skipping plot stage", file=sys.stderr)
         return
 
-    plt.style.use("seaborn-v0_8-whitegrid")
-    threads, speedups = zip(*points)
-    threads = list(threads)
-    speedups = list(speedups)
+    from speedup_math import compute_curves
+
+    _apply_plot_style()
 
-    baseline_threads = min(threads)
-    baseline_speedup = speedups[threads.index(baseline_threads)]
-    ideal_speedups = [baseline_speedup * (t / baseline_threads) for t in threads]
+    # compute_curves uses the first (smallest) thread count as its baseline.
+    threads, speedups = zip(*sorted(points, key=lambda p: p[0]))
+    threads = list(threads)
+    threads_a = np.asarray(threads, dtype=np.float64)
+    speedups_a = np.asarray(speedups, dtype=np.float64)
+    ideal_speedups, _ = compute_curves(threads_a, speedups_a)
 
     fig, ax = plt.subplots(figsize=(6.5, 4.2))
-    ax.plot(threads, speedups, marker="o", linewidth=2.2, label="Measured speedup")
+    ax.plot(threads_a, speedups_a, marker="o", linewidth=2.2, label="Measured speedup")
     ax.plot(
-        threads,
+        threads_a,
         ideal_speedups,
         linestyle="--",
         linewidth=1.6,
@@ -147,23 +319,17 @@ def try_plot(
     ax.set_xlabel("Number of Threads", fontsize=11)
     ax.set_ylabel("Speedup", fontsize=11)
     ax.set_xticks(threads)
-    max_y = max(max(speedups), max(ideal_speedups))
+    max_y = max(speedups_a.max(), ideal_speedups.max())
     ax.set_ylim(0, max_y * 1.15)
     ax.tick_params(axis="both", labelsize=10)
     ax.legend(frameon=False, fontsize=10, loc="upper left")
     ax.set_facecolor("#f8f9fb")
     for spine in ["top", "right"]:
         ax.spines[spine].set_visible(False)
-    for x, y in zip(threads, speedups):
-        ax.annotate(
-            f"{y:.2f}",
-            (x, y),
-            textcoords="offset points",
-            xytext=(0, 6),
-            ha="center",
-            fontsize=9,
-            color="#2f4b7c",
-        )
+    y_min, y_max = ax.get_ylim()
+    y_offset = (y_max - y_min) * 0.015
+    for x, y in np.column_stack((threads_a, speedups_a)):
+        ax.text(x, y + y_offset, f"{y:.2f}", ha="center", va="bottom", fontsize=9, color="#2f4b7c")
     fig.tight_layout()
 
     if png_path:
@@ -182,21 +348,36 @@ def main() -> None:
     if not args.exe.exists():
         sys.exit(f"Executable {args.exe} does not exist. Build mandelbrot first.")
 
-    measurements = []
-    for t in args.threads:
-        serial_ms, thread_ms, speedup = run_case(args.exe, t, args.view, args.extra)
-        measurements.append((t, serial_ms, thread_ms, speedup))
-        print(
-            f"threads={t:2d} serial={serial_ms:8.3f}ms threaded={thread_ms:8.3f}ms speedup={speedup:5.2f}"
-        )
-
-    with args.csv.open("w", newline="") as fp:
-        writer = csv.writer(fp)
-        writer.writerow(["threads", "serial_ms", "thread_ms", "speedup"])
-        writer.writerows(measurements)
+    # Rows are written and flushed as soon as they are parsed so a failing
+    # sweep still leaves the completed cases on disk.
+    speedup_points = []
+    with args.csv.open("wb") as fp:
+        fp.write(CSV_HEADER)
+        lanes = []
+        if args.pack_cpus:
+            if shutil.which("taskset") is None:
+                print("taskset not available; running the sweep sequentially", file=sys.stderr)
+            else:
+                cpus = available_cpus()
+                lanes = plan_lanes(args.threads, cpus)
+                if len(lanes) < 2:
+                    print(
+                        f"not enough CPUs ({len(cpus)}) to pack thread counts "
+                        f"{args.threads} into separate lanes; running the sweep sequentially",
+                        file=sys.stderr,
+                    )
+        if len(lanes) > 1:
+            rows = run_packed(args.exe, args.threads, lanes, args.view, args.extra)
+        else:
+            rows = run_sweep(args.exe, args.threads, args.view, args.extra)
+        for row in rows:
+            t, serial_ms, thread_ms, speedup = row
+            fp.write(CSV_ROW_FMT % row)
+            fp.flush()
+            speedup_points.append((t, speedup))
+            print(ROW_FMT.format(t, serial_ms, thread_ms, speedup))
     print(f"Wrote {args.csv}")
 
-    speedup_points = [(t, s) for t, _, _, s in measurements]
     if args.png or args.show:
         try_plot(speedup_points, args.png, args.show, args.view)
 
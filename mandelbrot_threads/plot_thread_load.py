@@ -4,12 +4,37 @@ from __future__ import annotations
 
 import argparse
 import csv
+import os
+import signal
 import subprocess
 from pathlib import Path
-from typing import Dict, List
+from typing import TYPE_CHECKING, Any, Dict, List
+
+import numpy as np
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 SCRIPT_DIR = Path(__file__).resolve().parent
 
+INVOKE_FMT = "[invoke] Run {}/{}: {}"
+
+TIMING_DTYPES = {
+    "run_id": "int32",
+    "label": "category",
+    "thread_id": "int32",
+    "duration_ms": "float32",
+}
+
+RUN_RECORD_DTYPE = np.dtype(
+    [
+        ("run_id", np.int32),
+        ("label", object),
+        ("thread_id", np.int32),
+        ("duration_ms", np.float32),
+    ]
+)
+
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description=__doc__)
@@ -81,60 +106,101 @@ def parse_args() -> argparse.Namespace:
     if args.extra and args.extra[0] == "--":
         args.extra = args.extra[1:]
 
+    # Paths are only opened or spawned, so making them absolute is enough;
+    # resolving symlinks would just add filesystem round trips.
+    cwd = Path.cwd()
+
     csv_path = args.csv or (SCRIPT_DIR / "thread_timings.csv")
     if not csv_path.is_absolute():
-        csv_path = (Path.cwd() / csv_path).resolve()
+        csv_path = cwd / csv_path
     args.csv = csv_path
 
     exe_path = args.exe or (SCRIPT_DIR / "mandelbrot")
     if not exe_path.is_absolute():
-        exe_path = (Path.cwd() / exe_path).resolve()
+        exe_path = cwd / exe_path
     args.exe = exe_path
 
     return args
 
 
-def load_records(path: Path) -> List[Dict[str, str]]:
+def load_records(path: Path) -> pd.DataFrame | None:
+    # pandas is optional and only imported here, after main's early return
+    # for runs without plot output.
+    try:
+        import pandas as pd
+    except ImportError:
+        return None
+
+    try:
+        return pd.read_csv(path, usecols=list(TIMING_DTYPES), dtype=TIMING_DTYPES)
+    except pd.errors.EmptyDataError:
+        raise RuntimeError(f"CSV file {path} is empty.") from None
+
+
+def scan_run_ids(path: Path) -> set[int]:
+    with path.open(newline="") as fp:
+        reader = csv.reader(fp)
+        header = next(reader, None)
+        if header is None:
+            return set()
+        col = header.index("run_id")
+        return {int(row[col]) for row in reader if row}
+
+
+def load_run(path: Path, target: int) -> np.ndarray:
+    with path.open(newline="") as fp:
+        reader = csv.DictReader(fp)
+        rows = [
+            (target, r["label"], int(r["thread_id"]), float(r["duration_ms"]))
+            for r in reader
+            if int(r["run_id"]) == target
+        ]
+    rows.sort(key=lambda r: r[2])
+    return np.array(rows, dtype=RUN_RECORD_DTYPE)
+
+
+def pick_run(path: Path, requested: int | None) -> np.ndarray:
     if not path.exists():
         raise FileNotFoundError(f"CSV file {path} not found. Did you enable ENABLE_THREAD_TIMING?")
 
-    with path.open() as fp:
-        reader = csv.DictReader(fp)
-        records = [row for row in reader]
-    if not records:
+    # Without pandas, stream the CSV twice (run ids, then the chosen run)
+    # rather than holding every row in memory.
+    records = load_records(path)
+    if records is None:
+        run_ids = sorted(scan_run_ids(path))
+    else:
+        run_ids = np.unique(records["run_id"]).tolist()
+    if not run_ids:
         raise RuntimeError(f"CSV file {path} is empty.")
-    return records
 
-
-def pick_run(records: List[Dict[str, str]], requested: int | None) -> List[Dict[str, str]]:
-    run_ids = sorted({int(r["run_id"]) for r in records})
     if requested is None:
         target = run_ids[-1]
     else:
         if requested not in run_ids:
             raise ValueError(f"run_id {requested} not present. Available: {run_ids}")
         target = requested
-    subset = [r for r in records if int(r["run_id"]) == target]
-    subset.sort(key=lambda r: int(r["thread_id"]))
-    return subset
+
+    if records is None:
+        return load_run(path, target)
+    subset = records[records["run_id"] == target]
+    return subset.sort_values("thread_id", kind="stable").to_records(index=False)
 
 
-def prepare_data(run_records: List[Dict[str, str]], sort_mode: str) -> Dict[str, List[float]]:
-    durations = [float(r["duration_ms"]) for r in run_records]
-    thread_ids = [int(r["thread_id"]) for r in run_records]
-    labels = [r["label"] for r in run_records]
-    label = labels[0] if labels else ""
+def prepare_data(run_records: np.ndarray, sort_mode: str) -> Dict[str, Any]:
+    durations = run_records["duration_ms"]
+    thread_ids = run_records["thread_id"]
+    label = str(run_records["label"][0]) if run_records.size else ""
 
-    paired = list(zip(thread_ids, durations))
+    # pick_run already returns the run ordered by thread id, so only the
+    # duration ordering needs a sort. Negating keeps ties in thread order.
     if sort_mode == "duration":
-        paired.sort(key=lambda it: it[1], reverse=True)
-    else:
-        paired.sort(key=lambda it: it[0])
+        order = np.argsort(-durations, kind="stable")
+        thread_ids = thread_ids[order]
+        durations = durations[order]
 
-    sorted_threads, sorted_durations = zip(*paired)
     return {
-        "threads": list(sorted_threads),
-        "durations": list(sorted_durations),
+        "threads": thread_ids,
+        "durations": durations,
         "label": label,
     }
 
@@ -150,40 +216,60 @@ def run_mandelbrot(exe: Path, threads: int | None, view: int, repeat: int, extra
         base_cmd += ["--view", str(view)]
     base_cmd += extra
 
+    cmd_line = " ".join(base_cmd)
     for i in range(repeat):
-        print(f"[invoke] Run {i + 1}/{repeat}:", " ".join(base_cmd))
-        subprocess.run(base_cmd, check=True)
-
-
-def plot_distributions(data: Dict[str, List[float]], run_id: int, png_path: Path | None, show: bool) -> None:
+        print(INVOKE_FMT.format(i + 1, repeat, cmd_line), flush=True)
+        # Match subprocess.run(restore_signals=True): Python ignores SIGPIPE
+        # and SIGXFSZ, and posix_spawn would pass that on to the child.
+        pid = os.posix_spawn(
+            base_cmd[0],
+            base_cmd,
+            os.environ,
+            setsigdef=(signal.SIGPIPE, signal.SIGXFSZ),
+        )
+        try:
+            _, status = os.waitpid(pid, 0)
+        except KeyboardInterrupt:
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+            raise
+        if os.WIFEXITED(status):
+            returncode = os.WEXITSTATUS(status)
+        else:
+            returncode = -os.WTERMSIG(status)
+        if returncode:
+            raise subprocess.CalledProcessError(returncode, base_cmd)
+
+
+def plot_distributions(data: Dict[str, Any], run_id: int, png_path: Path | None, show: bool) -> None:
     try:
+        import matplotlib
         import matplotlib.pyplot as plt
-        from matplotlib import cm, colors
+        from matplotlib import colors
     except ImportError as exc:
         raise RuntimeError("matplotlib is required for plotting") from exc
 
     threads = data["threads"]
-    durations = data["durations"]
+    durations = np.asarray(data["durations"])
     label = data["label"]
 
-    cmap = cm.get_cmap("magma")
-    norm = colors.Normalize(vmin=min(durations), vmax=max(durations) + 1e-9)
-    bar_colors = [cmap(norm(val)) for val in durations]
+    cmap = matplotlib.colormaps["magma"]
+    norm = colors.Normalize(vmin=durations.min(), vmax=durations.max() + 1e-9)
+    lut = cmap(np.linspace(0.0, 1.0, cmap.N))
+    idx = np.clip((norm(durations) * cmap.N).astype(np.intp), 0, cmap.N - 1)
+    bar_colors = lut[idx]
 
     fig, ax = plt.subplots(figsize=(7.2, 4.6))
-    y_pos = range(len(threads))
-    ax.barh(list(y_pos), durations, color=bar_colors)
-    ax.set_yticks(list(y_pos))
+    y_pos = np.arange(len(threads))
+    bars = ax.barh(y_pos, durations, color=bar_colors)
+    ax.set_yticks(y_pos)
     ax.set_yticklabels([f"T{tid}" for tid in threads])
     ax.invert_yaxis()
 
-    mean_val = sum(durations) / len(durations)
+    mean_val = durations.mean()
     ax.axvline(mean_val, color="#2f4b7c", linestyle="--", linewidth=1.5, label="Mean time")
 
-    max_duration = max(durations)
-    offset = max_duration * 0.01
-    for idx, duration in enumerate(durations):
-        ax.text(duration + offset, idx, f"{duration:.2f} ms", va="center", fontsize=9)
+    ax.bar_label(bars, labels=[f"{d:.2f} ms" for d in durations], padding=3, fontsize=9)
 
     ax.set_xlabel("Thread runtime (ms)", fontsize=11)
     title = f"Thread runtime distribution (run {run_id})"
@@ -208,8 +294,9 @@ def main() -> None:
     args = parse_args()
     if args.invoke:
         run_mandelbrot(args.exe, args.threads, args.view, args.repeat, args.extra)
-    records = load_records(args.csv)
-    run_records = pick_run(records, args.run_id)
+    if not (args.png or args.show):
+        return
+    run_records = pick_run(args.csv, args.run_id)
     run_id = int(run_records[0]["run_id"])
     data = prepare_data(run_records, args.sort)
     plot_distributions(data, run_id, args.png, args.show)
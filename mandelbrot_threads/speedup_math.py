@@ -0,0 +1,24 @@
+"""Speedup-curve helpers used by plot_speedup.py (JIT-compiled when numba is installed)."""
+from __future__ import annotations
+
+from typing import Tuple
+
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+
+    def njit(*args, **kwargs):
+        def decorator(func):
+            return func
+
+        return decorator
+
+
+@njit(cache=True)
+def compute_curves(threads: np.ndarray, speedups: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # Callers pass thread counts sorted ascending, so entry 0 is the baseline.
+    ideal = speedups[0] * threads / threads[0]
+    efficiency = speedups / ideal
+    return ideal, efficiency